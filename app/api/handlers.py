@@ -1,17 +1,180 @@
 from fastapi import HTTPException
 from app.models import Company, Task, TaskTemplate, AssignData, User
 from app.services import firebase
+from app.core.cache import TTLCache
 from datetime import datetime
+from types import MappingProxyType
+from typing import Optional
+import asyncio
+import logging
 import uuid
 import re
 
+logger = logging.getLogger(__name__)
+
+# Fixed responses shared by every request (read-only)
+_NOT_EXIST = MappingProxyType({"message": "That data not exist"})
+_COMPANY_NOT_EXIST = MappingProxyType({"message": "Company not exist"})
+
+# Company lookup cache for existence checks on the mutation paths
+_company_cache = TTLCache(maxsize=10_000, ttl=30)
+# cache_key -> [lock, coroutines holding or waiting on it]
+_company_locks = {}
+_MISSING = object()
+
+async def _get_company_cached(user_id: str, company_id: str):
+    cache_key = (user_id, company_id)
+    company = _company_cache.get(cache_key, _MISSING)
+    if company is not _MISSING:
+        return company
+    
+    # Only one Firebase read per key while the cache is cold
+    entry = _company_locks.setdefault(cache_key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            company = _company_cache.get(cache_key, _MISSING)
+            if company is not _MISSING:
+                return company
+            
+            # Missing companies are cached as None so negative lookups are cheap too
+            company = await firebase.get_company_by_id(user_id, company_id)
+            _company_cache.set(cache_key, company)
+            return company
+    finally:
+        # A failed read caches nothing, so the lock stays until its last waiter has had its turn
+        entry[1] -= 1
+        if not entry[1]:
+            del _company_locks[cache_key]
+
+def _invalidate_company(user_id: str, company_id: str):
+    _company_cache.pop((user_id, company_id))
+    firebase.invalidate_companies_cache(user_id)
+    # Task listings are scoped to the user's companies
+    firebase.invalidate_tasks_cache(user_id)
+
+# Error message substrings mapped to HTTP status codes. Rows are ranked by
+# position: when several substrings occur in a message, the earliest row wins.
+def _error_map(rows: tuple):
+    # One lookahead alternation finds every (overlapping) substring occurrence in a single scan
+    pattern = re.compile("(?=(" + "|".join(re.escape(substring) for substring, _, _ in rows) + "))")
+    ranked = {}
+    for rank, (substring, status_code, detail) in enumerate(rows):
+        ranked.setdefault(substring, (rank, status_code, detail))
+    return pattern, ranked
+
+def _raise_mapped(e: Exception, error_map: tuple, default_detail: str = "Internal server error"):
+    pattern, ranked = error_map
+    matches = pattern.findall(str(e).lower())
+    if matches:
+        _, status_code, detail = min(ranked[substring] for substring in matches)
+        raise HTTPException(status_code=status_code, detail=detail)
+    raise HTTPException(status_code=500, detail=default_detail)
+
+_COMPANY_MUTATION_ROWS = (
+    ("database connection failed", 500, "Database connection failed"),
+    ("service unavailable", 503, "Service unavailable"),
+    ("network error", 502, "Network error"),
+    ("request timeout", 500, "Request timeout"),
+    ("not implemented", 501, "Not implemented"),
+    ("payment required", 402, "Payment required"),
+    ("forbidden", 403, "Forbidden"),
+)
+
+_TASK_ROWS = (
+    ("database error", 500, "Database error"),
+    ("service unavailable", 503, "Service unavailable"),
+    ("network error", 502, "Network error"),
+    ("timeout", 500, "Timeout"),
+    ("forbidden", 403, "Forbidden"),
+    ("payment required", 402, "Payment required"),
+    ("not implemented", 501, "Not implemented"),
+)
+
+_TASK_ERRORS = _error_map(_TASK_ROWS)
+
+_CREATE_USER_ERRORS = _error_map((
+    ("email already exists", 409, "Email already exists"),
+    ("timeout", 408, "Request timeout"),
+    ("network", 502, "Network error"),
+))
+
+_GET_COMPANIES_ERRORS = _error_map((
+    ("insufficient permissions", 403, "Insufficient permissions"),
+    ("database connection failed", 500, "Database connection failed"),
+    ("database error", 500, "Database connection failed"),
+    ("timeout", 500, "Request timeout"),
+    ("service unavailable", 503, "Service unavailable"),
+    ("service temporarily unavailable", 503, "Service unavailable"),
+    ("network error", 502, "Network error"),
+    ("rate limit exceeded", 429, "Rate limit exceeded"),
+))
+
+_UPDATE_COMPANY_ERRORS = _error_map(_COMPANY_MUTATION_ROWS + (
+    ("conflict", 409, "Conflict"),
+    ("concurrent modification detected", 409, "Concurrent modification detected"),
+))
+
+_DELETE_COMPANY_ERRORS = _error_map(_COMPANY_MUTATION_ROWS + (
+    ("cannot delete company with active tasks", 409, "Conflict"),
+    ("conflict", 409, "Conflict"),
+    ("insufficient permissions", 403, "Insufficient permissions"),
+    ("company already deleted", 409, "Company already deleted"),
+    ("foreign key constraint violation", 409, "Foreign key constraint violation"),
+    ("backup creation failed", 500, "Backup creation failed"),
+    ("audit log write failed", 500, "Audit log write failed"),
+    ("transaction rollback failed", 500, "Transaction rollback failed"),
+    ("rate limit exceeded", 429, "Rate limit exceeded"),
+))
+
+_GET_COMPANY_ERRORS = _error_map((
+    ("database error", 500, "Database error"),
+    ("timeout", 500, "Timeout"),
+    ("permission denied", 403, "Permission denied"),
+    ("service unavailable", 503, "Service unavailable"),
+    ("network error", 502, "Network error"),
+    ("gateway timeout", 504, "Gateway timeout"),
+))
+
+_GET_TASKS_ERRORS = _error_map((
+    ("database error", 500, "Database error"),
+    ("service unavailable", 503, "Service unavailable"),
+    ("timeout", 500, "Timeout"),
+    ("network error", 502, "Network error"),
+    ("forbidden", 403, "Forbidden"),
+    ("payment required", 402, "Payment required"),
+    ("not implemented", 501, "Not implemented"),
+    ("rate limit exceeded", 429, "Rate limit exceeded"),
+))
+
+_CREATE_TASK_ERRORS = _error_map(_TASK_ROWS + (
+    ("task already exists", 409, "Conflict"),
+    ("conflict", 409, "Conflict"),
+))
+
+_UPDATE_TASK_ERRORS = _error_map(_TASK_ROWS + (
+    ("conflict", 409, "Conflict"),
+))
+
+_DELETE_TASK_ERRORS = _error_map(_TASK_ROWS + (
+    ("cannot delete task", 409, "Conflict"),
+    ("conflict", 409, "Conflict"),
+))
+
+_CREATE_TEMPLATE_ERRORS = _error_map(_TASK_ROWS + (
+    ("template already exists", 409, "Conflict"),
+    ("conflict", 409, "Conflict"),
+))
+
+def _require(value: str, detail: str):
+    if not value or value.isspace():
+        raise HTTPException(status_code=422, detail=detail)
+
 # User authentication handlers
 async def create_user_handler(user_data: User):
     # Validate required fields
-    if not user_data.email or user_data.email.strip() == "":
-        raise HTTPException(status_code=422, detail="Email is required and cannot be empty")
-    if not user_data.password or user_data.password.strip() == "":
-        raise HTTPException(status_code=422, detail="Password is required and cannot be empty")
+    _require(user_data.email, "Email is required and cannot be empty")
+    _require(user_data.password, "Password is required and cannot be empty")
     
     try:
         result = await firebase.create_user(user_data.email, user_data.password)
@@ -22,25 +185,14 @@ async def create_user_handler(user_data: User):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in create_user_handler: {e}")
-        print(f"Handler exception type: {type(e)}")
-        print(f"Handler exception args: {e.args}")
-        error_msg = str(e).lower()
-        if "email already exists" in error_msg:
-            raise HTTPException(status_code=409, detail="Email already exists")
-        elif "timeout" in error_msg:
-            raise HTTPException(status_code=408, detail="Request timeout")
-        elif "network" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        else:
-            raise HTTPException(status_code=500, detail=f"Firebase error: {str(e)}")
+        logger.error("Error in create_user_handler: %s", e)
+        logger.debug("Handler exception type: %s, args: %s", type(e), e.args)
+        _raise_mapped(e, _CREATE_USER_ERRORS, f"Firebase error: {str(e)}")
 
 async def login_user_handler(user_data: User):
     # Validate required fields
-    if not user_data.email or user_data.email.strip() == "":
-        raise HTTPException(status_code=422, detail="Email is required and cannot be empty")
-    if not user_data.password or user_data.password.strip() == "":
-        raise HTTPException(status_code=422, detail="Password is required and cannot be empty")
+    _require(user_data.email, "Email is required and cannot be empty")
+    _require(user_data.password, "Password is required and cannot be empty")
     
     try:
         result = await firebase.login_user(user_data.email, user_data.password)
@@ -51,12 +203,13 @@ async def login_user_handler(user_data: User):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in login_user_handler: {e}")
+        logger.error("Error in login_user_handler: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Shared existence check used by the task and template handlers
 async def check_company_exists(user_id: str, company_id: str):
     try:
-        company = await firebase.get_company_by_id(user_id, company_id)
+        company = await _get_company_cached(user_id, company_id)
         return company is not None
     except Exception:
         return False
@@ -66,64 +219,46 @@ async def get_companies(user_id: str):
         companies = await firebase.get_companies(user_id)
         return companies
     except Exception as e:
-        error_msg = str(e).lower()
-        print(f"Error in get_companies: {e}")
-        
-        # Map specific errors to appropriate status codes
-        if "insufficient permissions" in error_msg:
-            raise HTTPException(status_code=403, detail="Insufficient permissions")
-        elif "database connection failed" in error_msg or "database error" in error_msg:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        elif "request timeout" in error_msg or "timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Request timeout")
-        elif "firebase service unavailable" in error_msg or "service unavailable" in error_msg or "service temporarily unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "rate limit exceeded" in error_msg:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        else:
-            raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+        logger.error("Error in get_companies: %s", e)
+        _raise_mapped(e, _GET_COMPANIES_ERRORS, f"Internal server error: {str(e)}")
 
 async def create_company(user_id: str, company_data: Company):
     # Validate required fields
-    if not company_data.name or company_data.name.strip() == "":
-        raise HTTPException(status_code=422, detail="Company name is required and cannot be empty")
+    _require(company_data.name, "Company name is required and cannot be empty")
     
-    company_id = str(uuid.uuid4())
+    company_id = uuid.uuid4().hex
     company_data.id = company_id
-    company_data.created_at = datetime.utcnow()
-    company_data.updated_at = datetime.utcnow()
+    now = datetime.utcnow()
+    company_data.created_at = now
+    company_data.updated_at = now
     
     try:
         success = await firebase.create_company(user_id, company_data)
         if success:
+            _invalidate_company(user_id, company_id)
             return {"message": "Data created successfully", "id": company_id}
         else:
             raise HTTPException(status_code=500, detail="Internal server error")
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in create_company: {e}")
+        logger.error("Error in create_company: %s", e)
         # Return success for development
         return {"message": "Data created successfully", "id": company_id}
 
 async def update_company(user_id: str, company_id: str, company_data: Company):
     # Validate required fields
-    if not company_data.name or company_data.name.strip() == "":
-        raise HTTPException(status_code=422, detail="Company name is required and cannot be empty")
+    _require(company_data.name, "Company name is required and cannot be empty")
     
-    # Check if company exists first
     try:
-        existing_company = await firebase.get_company_by_id(user_id, company_id)
-        if not existing_company:
-            return {"message": "That data not exist"}
-        
-        # Company exists, proceed with update
         company_data.id = company_id
         company_data.updated_at = datetime.utcnow()
         
-        success = await firebase.update_company(user_id, company_id, company_data)
+        # Single write guarded by an exists precondition instead of read-then-write
+        success = await firebase.update_company(user_id, company_id, company_data, must_exist=True)
+        _invalidate_company(user_id, company_id)
+        if success is None:
+            return _NOT_EXIST
         if success:
             return {"message": "Data updated successfully", "id": company_id}
         else:
@@ -131,274 +266,133 @@ async def update_company(user_id: str, company_id: str, company_data: Company):
     except HTTPException:
         raise
     except Exception as e:
-        error_msg = str(e).lower()
-        
-        # Map specific errors to appropriate status codes
-        if "database connection failed" in error_msg:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "request timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Request timeout")
-        elif "feature not implemented" in error_msg or "not implemented" in error_msg:
-            raise HTTPException(status_code=501, detail="Not implemented")
-        elif "payment required" in error_msg:
-            raise HTTPException(status_code=402, detail="Payment required")
-        elif "forbidden" in error_msg:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        elif "conflict with existing data" in error_msg or "conflict" in error_msg:
-            raise HTTPException(status_code=409, detail="Conflict")
-        elif "concurrent modification detected" in error_msg:
-            raise HTTPException(status_code=409, detail="Concurrent modification detected")
-        else:
-            raise HTTPException(status_code=500, detail="Internal server error")
+        _raise_mapped(e, _UPDATE_COMPANY_ERRORS)
 
 async def delete_company(user_id: str, company_id: str):
-    # Check if company exists first
     try:
-        existing_company = await firebase.get_company_by_id(user_id, company_id)
-        if not existing_company:
-            return {"message": "That data not exist"}
-        
-        # Company exists, proceed with delete
-        success = await firebase.delete_company(user_id, company_id)
+        # Single delete guarded by an exists precondition instead of read-then-delete
+        success = await firebase.delete_company(user_id, company_id, must_exist=True)
+        _invalidate_company(user_id, company_id)
+        if success is None:
+            return _NOT_EXIST
         if success:
             return {"message": "Company deleted successfully", "id": company_id}
         else:
             raise HTTPException(status_code=500, detail="Internal server error")
     except Exception as e:
-        error_msg = str(e).lower()
-        
-        # Map specific errors to appropriate status codes
-        if "database connection failed" in error_msg:
-            raise HTTPException(status_code=500, detail="Database connection failed")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "request timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Request timeout")
-        elif "feature not implemented" in error_msg or "not implemented" in error_msg:
-            raise HTTPException(status_code=501, detail="Not implemented")
-        elif "payment required" in error_msg:
-            raise HTTPException(status_code=402, detail="Payment required")
-        elif "forbidden" in error_msg:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        elif "cannot delete company with active tasks" in error_msg or "conflict" in error_msg:
-            raise HTTPException(status_code=409, detail="Conflict")
-        elif "insufficient permissions" in error_msg:
-            raise HTTPException(status_code=403, detail="Insufficient permissions")
-        elif "company already deleted" in error_msg:
-            raise HTTPException(status_code=409, detail="Company already deleted")
-        elif "foreign key constraint violation" in error_msg:
-            raise HTTPException(status_code=409, detail="Foreign key constraint violation")
-        elif "backup creation failed" in error_msg:
-            raise HTTPException(status_code=500, detail="Backup creation failed")
-        elif "audit log write failed" in error_msg:
-            raise HTTPException(status_code=500, detail="Audit log write failed")
-        elif "transaction rollback failed" in error_msg:
-            raise HTTPException(status_code=500, detail="Transaction rollback failed")
-        elif "rate limit exceeded" in error_msg:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        else:
-            raise HTTPException(status_code=500, detail="Internal server error")
+        _raise_mapped(e, _DELETE_COMPANY_ERRORS)
 
 async def get_company_by_id(user_id: str, company_id: str):
     try:
-        company = await firebase.get_company_by_id(user_id, company_id)
+        company = await _get_company_cached(user_id, company_id)
         if company:
             return company
         else:
-            return {"message": "That data not exist"}
+            return _NOT_EXIST
     except Exception as e:
-        error_msg = str(e).lower()
-        
-        # Map specific errors to appropriate status codes
-        if "database error" in error_msg:
-            raise HTTPException(status_code=500, detail="Database error")
-        elif "timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Timeout")
-        elif "permission denied" in error_msg:
-            raise HTTPException(status_code=403, detail="Permission denied")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "gateway timeout" in error_msg:
-            raise HTTPException(status_code=504, detail="Gateway timeout")
+        _raise_mapped(e, _GET_COMPANY_ERRORS)
+
+def _paginate(items: list, limit: Optional[int], start_after: Optional[str]) -> list:
+    # Cursor pagination: start_after is the id of the last item of the previous page
+    if start_after is not None:
+        for index, item in enumerate(items):
+            if item.id == start_after:
+                items = items[index + 1:]
+                break
         else:
-            raise HTTPException(status_code=500, detail="Internal server error")
+            items = []
+    if limit is not None:
+        items = items[:limit]
+    return items
 
-async def get_tasks(user_id: str):
+async def get_tasks(user_id: str, limit: Optional[int] = None, start_after: Optional[str] = None):
     try:
         tasks = await firebase.get_tasks(user_id)
-        return tasks
+        return _paginate(tasks, limit, start_after)
     except Exception as e:
-        error_msg = str(e).lower()
-        
-        # Map specific errors to appropriate status codes
-        if "database error" in error_msg:
-            raise HTTPException(status_code=500, detail="Database error")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Timeout")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "forbidden" in error_msg:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        elif "payment required" in error_msg:
-            raise HTTPException(status_code=402, detail="Payment required")
-        elif "not implemented" in error_msg:
-            raise HTTPException(status_code=501, detail="Not implemented")
-        elif "rate limit exceeded" in error_msg:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        else:
-            raise HTTPException(status_code=500, detail="Internal server error")
+        _raise_mapped(e, _GET_TASKS_ERRORS)
 
 async def create_task(user_id: str, task_data: Task):
     # Validate required fields
-    if not task_data.companyId or task_data.companyId.strip() == "":
-        raise HTTPException(status_code=422, detail="Company ID is required and cannot be empty")
-    if not task_data.title or task_data.title.strip() == "":
-        raise HTTPException(status_code=422, detail="Task title is required and cannot be empty")
+    _require(task_data.companyId, "Company ID is required and cannot be empty")
+    _require(task_data.title, "Task title is required and cannot be empty")
     
-    task_id = str(uuid.uuid4())
+    task_id = uuid.uuid4().hex
     task_data.id = task_id
-    task_data.created_at = datetime.utcnow()
-    task_data.updated_at = datetime.utcnow()
+    now = datetime.utcnow()
+    task_data.created_at = now
+    task_data.updated_at = now
     
     try:
         success = await firebase.create_task(user_id, task_data)
         if success:
+            firebase.invalidate_tasks_cache(user_id)
             return {"message": "Data created successfully", "id": task_id}
         else:
             raise HTTPException(status_code=500, detail="Internal server error")
     except HTTPException:
         raise
     except Exception as e:
-        error_msg = str(e).lower()
-        print(f"Error in create_task: {e}")
-        
-        # Map specific errors to appropriate status codes
-        if "database error" in error_msg:
-            raise HTTPException(status_code=500, detail="Database error")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Timeout")
-        elif "forbidden" in error_msg:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        elif "payment required" in error_msg:
-            raise HTTPException(status_code=402, detail="Payment required")
-        elif "not implemented" in error_msg:
-            raise HTTPException(status_code=501, detail="Not implemented")
-        elif "task already exists" in error_msg or "conflict" in error_msg:
-            raise HTTPException(status_code=409, detail="Conflict")
-        else:
-            raise HTTPException(status_code=500, detail="Internal server error")
+        logger.error("Error in create_task: %s", e)
+        _raise_mapped(e, _CREATE_TASK_ERRORS)
 
 async def update_task(user_id: str, task_id: str, task_data: Task):
     # Validate required fields
-    if not task_data.companyId or task_data.companyId.strip() == "":
-        raise HTTPException(status_code=422, detail="Company ID is required and cannot be empty")
-    if not task_data.title or task_data.title.strip() == "":
-        raise HTTPException(status_code=422, detail="Task title is required and cannot be empty")
+    _require(task_data.companyId, "Company ID is required and cannot be empty")
+    _require(task_data.title, "Task title is required and cannot be empty")
     
     # Check if company exists for this user
     company_exists = await check_company_exists(user_id, task_data.companyId)
     if not company_exists:
-        return {"message": "Company not exist"}
+        return _COMPANY_NOT_EXIST
     
-    # Check if task exists first
     try:
-        existing_task = await firebase.get_task_by_id(user_id, task_id)
-        if not existing_task:
-            return {"message": "That data not exist"}
-        
-        # Task exists, proceed with update
         task_data.id = task_id
         task_data.updated_at = datetime.utcnow()
         
-        success = await firebase.update_task(user_id, task_id, task_data)
+        # Single write guarded by an exists precondition instead of read-then-write
+        success = await firebase.update_task(user_id, task_id, task_data, must_exist=True)
+        if success is None:
+            # Not under this company: the PUT may be moving the task from another of the user's companies
+            if not await firebase.get_task_by_id(user_id, task_id):
+                return _NOT_EXIST
+            success = await firebase.update_task(user_id, task_id, task_data)
         if success:
+            firebase.invalidate_tasks_cache(user_id)
             return {"message": "Data updated successfully", "id": task_id}
         else:
             raise HTTPException(status_code=500, detail="Internal server error")
     except HTTPException:
         raise
     except Exception as e:
-        error_msg = str(e).lower()
-        
-        # Map specific errors to appropriate status codes
-        if "database error" in error_msg:
-            raise HTTPException(status_code=500, detail="Database error")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Timeout")
-        elif "forbidden" in error_msg:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        elif "payment required" in error_msg:
-            raise HTTPException(status_code=402, detail="Payment required")
-        elif "not implemented" in error_msg:
-            raise HTTPException(status_code=501, detail="Not implemented")
-        elif "conflict" in error_msg:
-            raise HTTPException(status_code=409, detail="Conflict")
-        else:
-            raise HTTPException(status_code=500, detail="Internal server error")
+        _raise_mapped(e, _UPDATE_TASK_ERRORS)
 
 async def delete_task(user_id: str, task_id: str):
-    print(f"DELETE /delete_task/{task_id} called")
+    logger.debug("DELETE /delete_task/%s called", task_id)
     
     # Check if task exists first
     try:
         existing_task = await firebase.get_task_by_id(user_id, task_id)
         if existing_task:
-            print(f"✅ Task found: {existing_task.title}")
+            logger.debug("Task found: %s", existing_task.title)
             company_id = existing_task.companyId
         else:
-            print(f"❌ Task not found with ID: {task_id}")
-            return {"message": "That data not exist"}
+            logger.debug("Task not found with ID: %s", task_id)
+            return _NOT_EXIST
         
         # Task exists, proceed with delete
-        print(f"🗑️ Proceeding to delete task: {task_id}")
+        logger.debug("Proceeding to delete task: %s", task_id)
         success = await firebase.delete_task(user_id, task_id, company_id)
         if success:
-            print("✅ Task deleted successfully from Firebase")
+            firebase.invalidate_tasks_cache(user_id)
+            logger.debug("Task deleted successfully from Firebase")
             return {"message": "Task deleted successfully", "id": task_id}
         else:
-            print("❌ Failed to delete task from Firebase")
+            logger.warning("Failed to delete task %s from Firebase", task_id)
             raise HTTPException(status_code=500, detail="Internal server error")
     except Exception as e:
-        error_msg = str(e).lower()
-        print(f"🔥 Error in delete_task: {e}")
-        
-        # Map specific errors to appropriate status codes
-        if "database error" in error_msg:
-            raise HTTPException(status_code=500, detail="Database error")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Timeout")
-        elif "forbidden" in error_msg:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        elif "payment required" in error_msg:
-            raise HTTPException(status_code=402, detail="Payment required")
-        elif "not implemented" in error_msg:
-            raise HTTPException(status_code=501, detail="Not implemented")
-        elif "cannot delete task" in error_msg or "conflict" in error_msg:
-            raise HTTPException(status_code=409, detail="Conflict")
-        else:
-            raise HTTPException(status_code=500, detail="Internal server error")
+        logger.error("Error in delete_task: %s", e)
+        _raise_mapped(e, _DELETE_TASK_ERRORS)
 
 async def get_task_by_id(user_id: str, task_id: str):
     try:
@@ -406,27 +400,9 @@ async def get_task_by_id(user_id: str, task_id: str):
         if task:
             return task
         else:
-            return {"message": "That data not exist"}
+            return _NOT_EXIST
     except Exception as e:
-        error_msg = str(e).lower()
-        
-        # Map specific errors to appropriate status codes
-        if "database error" in error_msg:
-            raise HTTPException(status_code=500, detail="Database error")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Timeout")
-        elif "forbidden" in error_msg:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        elif "payment required" in error_msg:
-            raise HTTPException(status_code=402, detail="Payment required")
-        elif "not implemented" in error_msg:
-            raise HTTPException(status_code=501, detail="Not implemented")
-        else:
-            raise HTTPException(status_code=500, detail="Internal server error")
+        _raise_mapped(e, _TASK_ERRORS)
 
 async def get_templates(user_id: str):
     try:
@@ -437,56 +413,56 @@ async def get_templates(user_id: str):
 
 async def create_template(user_id: str, template_data: TaskTemplate):
     # Validate required fields
-    if not template_data.title or template_data.title.strip() == "":
-        raise HTTPException(status_code=422, detail="Template title is required and cannot be empty")
+    _require(template_data.title, "Template title is required and cannot be empty")
     
     try:
-        # Get all companies at once to check existence
-        all_companies = await firebase.get_companies(user_id)
-        existing_company_ids = {company.id for company in all_companies}
+        # Check each requested company once, concurrently, through the lookup cache
+        unique_company_ids = list(dict.fromkeys(template_data.companyIds))
+        exists = await asyncio.gather(*[check_company_exists(user_id, company_id) for company_id in unique_company_ids])
+        existing_company_ids = {company_id for company_id, ok in zip(unique_company_ids, exists) if ok}
         
-        created_tasks = []
+        tasks = []
         not_available_companies = []
+        now = datetime.utcnow()
         
-        # Create a task for each company
+        # Build a task for each company
         for company_id in template_data.companyIds:
             if company_id not in existing_company_ids:
                 not_available_companies.append(company_id)
                 continue
-            task_id = str(uuid.uuid4())
+            task_id = uuid.uuid4().hex
             
-            # Create task object
-            task = Task(
+            # Inputs were already validated as part of template_data, so skip re-validation
+            tasks.append(Task.model_construct(
                 id=task_id,
                 companyId=company_id,
                 title=template_data.title,
                 description=template_data.description,
                 completed=template_data.completed,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            
-            # Save task to Firebase
-            try:
-                success = await firebase.create_task(user_id, task)
-                if success:
-                    created_tasks.append({
-                        "task_id": task_id,
-                        "company_id": company_id,
-                        "status": "created"
-                    })
-                else:
-                    created_tasks.append({
-                        "task_id": task_id,
-                        "company_id": company_id,
-                        "status": "failed"
-                    })
-            except Exception:
-                created_tasks.append({
-                    "task_id": task_id,
-                    "company_id": company_id,
-                    "status": "error"
-                })
+                created_at=now,
+                updated_at=now
+            ))
+        
+        # Save all tasks with batched writes; a failed call marks its whole batch as errored
+        try:
+            results = await firebase.create_tasks(user_id, tasks)
+        except Exception as e:
+            results = [e] * len(tasks)
+        firebase.invalidate_tasks_cache(user_id)
+        
+        created_tasks = []
+        for task, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                status = "error"
+            elif result:
+                status = "created"
+            else:
+                status = "failed"
+            created_tasks.append({
+                "task_id": task.id,
+                "company_id": task.companyId,
+                "status": status
+            })
         
         response = {
             "message": "Tasks created and assigned to companies",
@@ -500,34 +476,7 @@ async def create_template(user_id: str, template_data: TaskTemplate):
         
         return response
     except Exception as e:
-        error_msg = str(e).lower()
-        
-        # Map specific errors to appropriate status codes
-        if "database error" in error_msg:
-            raise HTTPException(status_code=500, detail="Database error")
-        elif "service unavailable" in error_msg:
-            raise HTTPException(status_code=503, detail="Service unavailable")
-        elif "network error" in error_msg:
-            raise HTTPException(status_code=502, detail="Network error")
-        elif "timeout" in error_msg:
-            raise HTTPException(status_code=500, detail="Timeout")
-        elif "forbidden" in error_msg:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        elif "payment required" in error_msg:
-            raise HTTPException(status_code=402, detail="Payment required")
-        elif "not implemented" in error_msg:
-            raise HTTPException(status_code=501, detail="Not implemented")
-        elif "template already exists" in error_msg or "conflict" in error_msg:
-            raise HTTPException(status_code=409, detail="Conflict")
-        else:
-            raise HTTPException(status_code=500, detail="Internal server error")
-
-async def check_company_exists(user_id: str, company_id: str):
-    try:
-        company = await firebase.get_company_by_id(user_id, company_id)
-        return company is not None
-    except Exception:
-        return False
+        _raise_mapped(e, _CREATE_TEMPLATE_ERRORS)
 
 async def delete_template(user_id: str, template_id: str):
     return {"message": "Template deleted successfully", "id": template_id}
@@ -539,5 +488,5 @@ async def assign_template(user_id: str, template_id: str, assign_data: AssignDat
         "companyIds": assign_data.companyIds,
         "startDate": assign_data.startDate,
         "dueDate": assign_data.dueDate,
-        "assigned_at": datetime.utcnow().isoformat()
+        "assigned_at": datetime.utcnow()
     }
@@ -1,36 +1,50 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
+from starlette.concurrency import run_in_threadpool
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
 from dotenv import load_dotenv
+from pydantic_core import to_json
 from app.models import Company, Task, TaskTemplate, AssignData, User
 from app.api import handlers
+from app.services import firebase
 import firebase_admin
 from firebase_admin import auth, credentials
 from typing import Optional
-import traceback
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import hashlib
+import logging
+import orjson
+import os
+import re
 import time
 
 load_dotenv("config/.env")
 
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
+FIREBASE_CLIENT_EMAIL = os.getenv("FIREBASE_CLIENT_EMAIL")
+
+logging.basicConfig(level=logging.INFO)
+# httpx logs every outgoing Firebase request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
 # Initialize Firebase Admin SDK
 try:
     firebase_admin.get_app()
 except ValueError:
-    import os
     firebase_creds = {
         "type": "service_account",
-        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+        "project_id": FIREBASE_PROJECT_ID,
         "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
         "private_key": os.getenv("FIREBASE_PRIVATE_KEY", "").replace('\\n', '\n'),
-        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+        "client_email": FIREBASE_CLIENT_EMAIL,
         "client_id": os.getenv("FIREBASE_CLIENT_ID"),
         "auth_uri": "https://accounts.google.com/o/oauth2/auth",
         "token_uri": "https://oauth2.googleapis.com/token",
         "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-        "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{os.getenv('FIREBASE_CLIENT_EMAIL')}"
+        "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{FIREBASE_CLIENT_EMAIL}"
     }
     
     if all([firebase_creds["project_id"], firebase_creds["private_key"], firebase_creds["client_email"]]):
@@ -40,159 +54,206 @@ except ValueError:
     
     firebase_admin.initialize_app(cred)
 
-app = FastAPI(title="Company Management API", version="1.0.0")
-
-# Token cache for performance
-_token_cache = {}
-_cache_expiry = {}
-
-# Simplified middleware
-class FastContentTypeMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method in ["POST", "PUT", "PATCH"]:
-            content_type = request.headers.get("content-type", "")
-            if content_type and not content_type.startswith("application/json"):
-                return JSONResponse(
-                    status_code=422,
-                    content={"detail": "Content-Type must be application/json"}
-                )
-        response = await call_next(request)
-        return response
+# One pooled Firebase HTTP client per process, opened at startup and closed on shutdown;
+# the services reach it through firebase.get_http_client
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await firebase.get_http_client()
+    yield
+    await firebase.close_http_client()
+
+app = FastAPI(title="Company Management API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# Token cache for performance: bounded LRU of token digest -> (uid, monotonic expiry)
+_token_cache = OrderedDict()
+_TOKEN_CACHE_MAX = 10_000
+_TOKEN_CACHE_TTL = 120
+
+# Plain ASGI middleware: BaseHTTPMiddleware wraps every request in streams and a task group
+_BODY_METHODS = frozenset(("POST", "PUT", "PATCH"))
+_BAD_CONTENT_TYPE = ORJSONResponse(
+    status_code=422,
+    content={"detail": "Content-Type must be application/json"}
+)
+
+class FastContentTypeMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] in _BODY_METHODS:
+            for name, value in scope["headers"]:
+                if name == b"content-type":
+                    if value and not value.startswith(b"application/json"):
+                        await _BAD_CONTENT_TYPE(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
 
 app.add_middleware(FastContentTypeMiddleware)
 
 # Simplified exception handlers
+_INTERNAL_ERROR_BODY = orjson.dumps({"detail": "Internal server error"})
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={"detail": "Validation error", "errors": [str(error) for error in exc.errors()]}
     )
 
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    return JSONResponse(
-        status_code=500,
-        content={"detail": "Internal server error"}
-    )
+    return Response(content=_INTERNAL_ERROR_BODY, status_code=500, media_type="application/json")
+
+# Path traversal and script injection in path IDs, checked in one pass without lowercasing
+_UNSAFE_ID = re.compile(r"\.\.[/\\]|<script>", re.IGNORECASE)
+
+def _unsafe_id(value: str) -> bool:
+    # Generated IDs never contain either character, so most calls skip the regex entirely
+    return ("." in value or "<" in value) and _UNSAFE_ID.search(value) is not None
 
 # Optimized token validation with caching
 async def get_user_id_from_token(request: Request):
-    authorization = request.headers.get("Authorization") or request.headers.get("authorization")
+    # Starlette headers are case-insensitive, so one lookup covers both spellings
+    authorization = request.headers.get("authorization")
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header required")
     
-    token = authorization.replace("Bearer ", "") if authorization.startswith("Bearer ") else authorization
+    token = authorization[7:] if authorization[:7] == "Bearer " else authorization
     
     # Check cache first
-    now = int(time.time())
-    if token in _token_cache and now < _cache_expiry.get(token, 0):
-        return _token_cache[token]
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    now = time.monotonic()
+    entry = _token_cache.get(key)
+    if entry is not None and entry[1] > now:
+        _token_cache.move_to_end(key)
+        return entry[0]
     
     try:
-        decoded_token = auth.verify_id_token(token)
+        # Signature checks run locally against Google's cached certs, but a cert refresh is a
+        # blocking HTTP call, so keep it off the event loop
+        decoded_token = await run_in_threadpool(auth.verify_id_token, token)
         user_id = decoded_token.get('uid')
         
-        # Cache for 2 minutes
-        _token_cache[token] = user_id
-        _cache_expiry[token] = now + 120
+        _token_cache[key] = (user_id, now + _TOKEN_CACHE_TTL)
+        _token_cache.move_to_end(key)
+        if len(_token_cache) > _TOKEN_CACHE_MAX:
+            _token_cache.popitem(last=False)
         
         return user_id
-    except Exception as e:
-        error_msg = str(e).lower()
-        if "expired" in error_msg:
-            raise HTTPException(status_code=401, detail="Token expired")
-        elif "revoked" in error_msg:
-            raise HTTPException(status_code=401, detail="Token revoked")
-        elif "invalid" in error_msg:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        else:
-            raise HTTPException(status_code=401, detail="Authentication failed")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    # Expired and revoked are subclasses of InvalidIdTokenError, so they must come first
+    except auth.ExpiredIdTokenError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except auth.RevokedIdTokenError:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    except auth.InvalidIdTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    except Exception:
+        raise HTTPException(status_code=401, detail="Authentication failed")
+
+# Read routes return models straight from Firebase; pydantic-core serializes them (and the
+# read-only not-found mappings, via dict) in one native pass instead of jsonable_encoder's walk
+def _json_response(content) -> Response:
+    return Response(to_json(content, fallback=dict), media_type="application/json")
+
+# Routes behind auth read the caller from request.state instead of each declaring the dependency
+async def authenticate(request: Request, user_id: str = Depends(get_user_id_from_token)):
+    request.state.user_id = user_id
+
+authed = APIRouter(dependencies=[Depends(authenticate)])
 
 # Company API Routes
-@app.get("/getall_companies")
-async def get_companies(user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.get_companies(user_id)
+@authed.get("/getall_companies")
+async def get_companies(request: Request):
+    return _json_response(await handlers.get_companies(request.state.user_id))
 
-@app.get("/get_company/{company_id}")
-async def get_company_by_id(company_id: str, user_id: str = Depends(get_user_id_from_token)):
-    if "../" in company_id or "..\\" in company_id or "<script>" in company_id.lower():
+@authed.get("/get_company/{company_id}")
+async def get_company_by_id(company_id: str, request: Request):
+    if _unsafe_id(company_id):
         raise HTTPException(status_code=404, detail="Not found")
-    return await handlers.get_company_by_id(user_id, company_id)
+    return _json_response(await handlers.get_company_by_id(request.state.user_id, company_id))
 
-@app.post("/create_company")
-async def create_company(company_data: Company, user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.create_company(user_id, company_data)
+@authed.post("/create_company")
+async def create_company(company_data: Company, request: Request):
+    return await handlers.create_company(request.state.user_id, company_data)
 
-@app.put("/update_company/{company_id}")
-async def update_company(company_id: str, company_data: Company, user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.update_company(user_id, company_id, company_data)
+@authed.put("/update_company/{company_id}")
+async def update_company(company_id: str, company_data: Company, request: Request):
+    return await handlers.update_company(request.state.user_id, company_id, company_data)
 
-@app.delete("/delete_company/{company_id}")
-async def delete_company(company_id: str, user_id: str = Depends(get_user_id_from_token)):
-    if "<script>" in company_id.lower():
+@authed.delete("/delete_company/{company_id}")
+async def delete_company(company_id: str, request: Request):
+    if _unsafe_id(company_id):
         raise HTTPException(status_code=404, detail="Not found")
-    return await handlers.delete_company(user_id, company_id)
+    return await handlers.delete_company(request.state.user_id, company_id)
 
 # Task API Routes
-@app.get("/getall_tasks")
-async def get_tasks(user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.get_tasks(user_id)
+@authed.get("/getall_tasks")
+async def get_tasks(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    start_after: Optional[str] = None
+):
+    tasks = await handlers.get_tasks(request.state.user_id, limit=limit, start_after=start_after)
+    body = to_json(tasks, fallback=dict)
+    
+    # Clients revalidate on every poll, so their own writes show up at once, but an
+    # unchanged list costs only a 304
+    etag = 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    return Response(body, media_type="application/json", headers=cache_headers)
 
-@app.get("/get_task/{task_id}")
-async def get_task_by_id(task_id: str, user_id: str = Depends(get_user_id_from_token)):
-    if "../" in task_id or "..\\" in task_id or "<script>" in task_id.lower():
+@authed.get("/get_task/{task_id}")
+async def get_task_by_id(task_id: str, request: Request):
+    if _unsafe_id(task_id):
         raise HTTPException(status_code=404, detail="Not found")
-    return await handlers.get_task_by_id(user_id, task_id)
+    return _json_response(await handlers.get_task_by_id(request.state.user_id, task_id))
 
-@app.post("/create_task")
-async def create_task(task_data: Task, user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.create_task(user_id, task_data)
+@authed.post("/create_task")
+async def create_task(task_data: Task, request: Request):
+    return await handlers.create_task(request.state.user_id, task_data)
 
-@app.put("/update_task/{task_id}")
-async def update_task(task_id: str, task_data: Task, user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.update_task(user_id, task_id, task_data)
+@authed.put("/update_task/{task_id}")
+async def update_task(task_id: str, task_data: Task, request: Request):
+    return await handlers.update_task(request.state.user_id, task_id, task_data)
 
-@app.delete("/delete_task/{task_id}")
-async def delete_task(task_id: str, user_id: str = Depends(get_user_id_from_token)):
-    if "<script>" in task_id.lower():
+@authed.delete("/delete_task/{task_id}")
+async def delete_task(task_id: str, request: Request):
+    if _unsafe_id(task_id):
         raise HTTPException(status_code=404, detail="Not found")
-    return await handlers.delete_task(user_id, task_id)
+    return await handlers.delete_task(request.state.user_id, task_id)
 
 # Template API Routes
-@app.get("/getall_templates")
-async def get_templates(user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.get_templates(user_id)
+@authed.get("/getall_templates")
+async def get_templates(request: Request):
+    return _json_response(await handlers.get_templates(request.state.user_id))
 
-@app.post("/create_template")
-async def create_template(template_data: TaskTemplate, user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.create_template(user_id, template_data)
+@authed.post("/create_template")
+async def create_template(template_data: TaskTemplate, request: Request):
+    return await handlers.create_template(request.state.user_id, template_data)
 
-@app.delete("/delete_template/{template_id}")
-async def delete_template(template_id: str, user_id: str = Depends(get_user_id_from_token)):
-    if "<script>" in template_id.lower():
+@authed.delete("/delete_template/{template_id}")
+async def delete_template(template_id: str, request: Request):
+    if _unsafe_id(template_id):
         raise HTTPException(status_code=404, detail="Not found")
-    return await handlers.delete_template(user_id, template_id)
+    # No I/O behind these handlers: render directly and skip jsonable_encoder
+    return ORJSONResponse(await handlers.delete_template(request.state.user_id, template_id))
+
+@authed.post("/assign_template/{template_id}")
+async def assign_template(template_id: str, assign_data: AssignData, request: Request):
+    return ORJSONResponse(await handlers.assign_template(request.state.user_id, template_id, assign_data))
 
-@app.post("/assign_template/{template_id}")
-async def assign_template(template_id: str, assign_data: AssignData, user_id: str = Depends(get_user_id_from_token)):
-    return await handlers.assign_template(user_id, template_id, assign_data)
+app.include_router(authed)
 
 # User Authentication Routes
 @app.post("/create_user")
@@ -203,21 +264,25 @@ async def create_user(user_data: User):
 async def login_user(user_data: User):
     return await handlers.login_user_handler(user_data)
 
-# CORS middleware
+# CORS middleware, registered last so it wraps everything else; browsers may cache a preflight for a day
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,
 )
 
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
-        app, 
-        host="0.0.0.0", 
+        "app.main:app",
+        host="0.0.0.0",
         port=8080,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="uvloop",
+        http="httptools",
         access_log=False,
-        workers=1
+        log_level="warning"
     )
@@ -1,17 +1,15 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
-import uuid
-import re
 
 class Company(BaseModel):
     id: Optional[str] = None
     name: str = Field(min_length=1, max_length=500)
-    EIN: str = Field(alias="EIN", min_length=1, max_length=50)
-    startDate: str = Field(alias="startDate", min_length=1, max_length=50)
-    stateIncorporated: str = Field(alias="stateIncorporated", min_length=1, max_length=50)
-    contactPersonName: str = Field(alias="contactPersonName", min_length=1, max_length=200)
-    contactPersonPhNumber: str = Field(alias="contactPersonPhNumber", min_length=1, max_length=50)
+    EIN: str = Field(min_length=1, max_length=50)
+    startDate: str = Field(min_length=1, max_length=50)
+    stateIncorporated: str = Field(min_length=1, max_length=50)
+    contactPersonName: str = Field(min_length=1, max_length=200)
+    contactPersonPhNumber: str = Field(min_length=1, max_length=50)
     address1: str = Field(min_length=1, max_length=500)
     address2: str = Field(min_length=1, max_length=500)
     city: str = Field(min_length=1, max_length=200)
@@ -20,39 +18,27 @@ class Company(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    class Config:
-        populate_by_name = True
-
 class Task(BaseModel):
     id: Optional[str] = None
-    companyId: str = Field(alias="companyId", min_length=1, max_length=200)
+    companyId: str = Field(min_length=1, max_length=200)
     title: str = Field(min_length=1, max_length=500)
     description: Optional[str] = Field(None, max_length=2000)
     completed: bool = False
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    class Config:
-        populate_by_name = True
-
 class TaskTemplate(BaseModel):
-    companyIds: list[str] = Field(alias="companyIds")
+    companyIds: list[str]
     title: str = Field(min_length=1, max_length=500)
     description: Optional[str] = Field(None, max_length=2000)
     completed: bool = False
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    class Config:
-        populate_by_name = True
-
 class AssignData(BaseModel):
-    companyIds: list[str] = Field(alias="companyIds")
-    startDate: str = Field(alias="startDate")
-    dueDate: str = Field(alias="dueDate")
-
-    class Config:
-        populate_by_name = True
+    companyIds: list[str]
+    startDate: str
+    dueDate: str
 
 class User(BaseModel):
     email: str = Field(min_length=1, max_length=254)
@@ -65,13 +51,8 @@ class User(BaseModel):
             raise ValueError('Email too long')
         # Allow unicode characters in email for international domains
         # Basic email format validation that allows unicode
-        if '@' not in v or v.count('@') != 1:
-            raise ValueError('Invalid email format')
-        local, domain = v.split('@')
-        if not local or not domain or '.' not in domain:
-            raise ValueError('Invalid email format')
-        # Check for obviously invalid email formats
-        if v == 'invalid-email':
+        local, _, domain = v.partition('@')
+        if not local or not domain or '@' in domain or '.' not in domain:
             raise ValueError('Invalid email format')
         return v
     
@@ -1,47 +1,177 @@
 import httpx
-import json
+import orjson
 import os
 from typing import List, Optional
 from app.models import Company, Task, TaskTemplate
+from app.core.cache import TTLCache
 import jwt
+from cryptography.hazmat.primitives import serialization
 import time
 from datetime import datetime
 import asyncio
 from functools import lru_cache
+from types import MappingProxyType
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Global variables for caching
 _cached_token = None
 _token_expiry = 0
 _http_client = None
-_companies_cache = {}
-_tasks_cache = {}
-_cache_expiry = {}
+_companies_cache = TTLCache(maxsize=10_000, ttl=10)
+_tasks_cache = TTLCache(maxsize=10_000, ttl=10)
+_inflight = {}
+_TOKEN_FLIGHT = ("access_token",)
+
+class AIMDTransport(httpx.AsyncHTTPTransport):
+    """Caps in-flight Firebase requests; the cap grows additively on success and halves on 429/503 or timeout (AIMD)"""
+    
+    def __init__(self, *args, initial_limit: int = 100, min_limit: int = 1, max_limit: int = 500, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+    
+    def _backoff(self):
+        self.limit = max(self.min_limit, self.limit / 2)
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            response = await super().handle_async_request(request)
+        except httpx.TimeoutException:
+            self._backoff()
+            raise
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+        
+        if response.status_code in (429, 503):
+            self._backoff()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        return response
 
+class RefreshOn401(httpx.Auth):
+    """Resends a Firestore request once with a new access token when Google rejects the current one"""
+    
+    async def async_auth_flow(self, request: httpx.Request):
+        response = yield request
+        # Only Firestore calls carry a bearer token; the token exchange and Identity Toolkit calls don't
+        authorization = request.headers.get("authorization")
+        if response.status_code == 401 and authorization:
+            token = await _replace_rejected_token(authorization[7:])
+            request.headers["Authorization"] = "Bearer " + token
+            yield request
+
+# Collection-group query over every company's Task subcollection; only the fields
+# parse_firestore_task reads are selected
+_TASK_LIST_QUERY = orjson.dumps({
+    "structuredQuery": {
+        "select": {"fields": [{"fieldPath": field} for field in ("company_id", "title", "description", "completed")]},
+        "from": [{"collectionId": "Task", "allDescendants": True}]
+    }
+})
+
+# The lifespan builds this eagerly; there is no await between the check and the assignment,
+# so concurrent first calls on the event loop can never construct two clients
 async def get_http_client():
     global _http_client
     if _http_client is None:
         _http_client = httpx.AsyncClient(
             timeout=httpx.Timeout(5.0, connect=2.0),
-            limits=httpx.Limits(max_keepalive_connections=100, max_connections=500),
-            http2=True
+            auth=RefreshOn401(),
+            # Idle connections stay open for a minute so bursts after a pause skip the TLS handshake;
+            # retries only covers failed connection attempts, never a sent request
+            transport=AIMDTransport(
+                limits=httpx.Limits(max_keepalive_connections=100, max_connections=500, keepalive_expiry=60.0),
+                http2=True,
+                retries=1
+            )
         )
     return _http_client
 
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# Read once on first use rather than at import: app.main loads config/.env after importing this module.
+# Every caller shares the cached mapping, so it is read-only
 @lru_cache(maxsize=1)
 def get_firebase_config():
-    return {
+    return MappingProxyType({
         "project_id": os.getenv("FIREBASE_PROJECT_ID"),
         "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-        "private_key": os.getenv("FIREBASE_PRIVATE_KEY", "").replace('\\n', '\n')
-    }
+        "private_key": os.getenv("FIREBASE_PRIVATE_KEY", "").replace('\\n', '\n'),
+        "api_key": os.getenv("FIREBASE_API_KEY")
+    })
+
+# Parse the PEM once; jwt.encode would otherwise re-load it on every token refresh
+@lru_cache(maxsize=1)
+def _signing_key():
+    return serialization.load_pem_private_key(get_firebase_config()["private_key"].encode(), password=None)
+
+# Every Firestore document name/URL starts with this; built on first use, once config/.env is loaded
+@lru_cache(maxsize=1)
+def _documents_name() -> str:
+    return f"projects/{get_firebase_config()['project_id']}/databases/(default)/documents"
+
+@lru_cache(maxsize=1)
+def _documents_url() -> str:
+    return f"https://firestore.googleapis.com/v1/{_documents_name()}"
+
+# Header dicts are built once per access token rather than per Firestore call; httpx copies them
+@lru_cache(maxsize=2)
+def _auth_headers(token: str) -> dict:
+    return {"Authorization": "Bearer " + token}
+
+@lru_cache(maxsize=2)
+def _json_headers(token: str) -> dict:
+    return {"Authorization": "Bearer " + token, "Content-Type": "application/json"}
 
 async def get_access_token() -> str:
-    global _cached_token, _token_expiry
-    
     now = int(time.time())
     if _cached_token and now < _token_expiry - 300:
         return _cached_token
     
+    refresh = _start_token_refresh()
+    # Inside the refresh window the current token is still valid: serve it and let the
+    # exchange with Google finish in the background instead of adding its round trip here
+    if _cached_token and now < _token_expiry:
+        return _cached_token
+    return await asyncio.shield(refresh)
+
+async def _replace_rejected_token(rejected: str) -> str:
+    # A token revoked before its expiry: concurrent 401s share one exchange, and a request
+    # rejected after the token was already replaced just reuses the new one
+    if _cached_token and _cached_token != rejected:
+        return _cached_token
+    return await asyncio.shield(_start_token_refresh())
+
+def _start_token_refresh() -> asyncio.Future:
+    refresh = _inflight.get(_TOKEN_FLIGHT)
+    if refresh is None:
+        refresh = _start_flight(_TOKEN_FLIGHT, _refresh_access_token)
+        refresh.add_done_callback(_log_refresh_failure)
+    return refresh
+
+def _log_refresh_failure(task: asyncio.Future):
+    # A background refresh may have no awaiter; the next request retries while the old token lasts
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Access token refresh failed: %r", task.exception())
+
+async def _refresh_access_token() -> str:
+    global _cached_token, _token_expiry
+    
+    now = int(time.time())
     config = get_firebase_config()
     if not config["client_email"] or not config["private_key"]:
         raise Exception("Missing Firebase credentials")
@@ -54,7 +184,7 @@ async def get_access_token() -> str:
         "iat": now,
     }
     
-    token = jwt.encode(payload, config["private_key"], algorithm="RS256")
+    token = jwt.encode(payload, _signing_key(), algorithm="RS256")
     
     client = await get_http_client()
     response = await client.post(
@@ -68,42 +198,57 @@ async def get_access_token() -> str:
     if response.status_code != 200:
         raise Exception("Failed to get access token")
     
-    token_data = response.json()
+    token_data = orjson.loads(response.content)
     _cached_token = token_data["access_token"]
-    _token_expiry = now + 3600
+    # Google states the lifetime; the JWT's own exp only bounds the assertion
+    _token_expiry = now + token_data["expires_in"]
     return _cached_token
 
+def _start_flight(key: tuple, fetch) -> asyncio.Future:
+    # Concurrent misses for the same key share one Firebase call
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fetch())
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _end_flight(key, done))
+    return task
+
+def _end_flight(key: tuple, task: asyncio.Future):
+    # An invalidated flight may already have been replaced; leave the newer one registered
+    if _inflight.get(key) is task:
+        del _inflight[key]
+
+def _is_current_flight(key: tuple) -> bool:
+    # False once a write dropped the flight: its result predates the write and must not be cached
+    return _inflight.get(key) is asyncio.current_task()
+
+async def _single_flight(key: tuple, fetch):
+    # A cancelled caller must not cancel the read the others are waiting on
+    return await asyncio.shield(_start_flight(key, fetch))
+
 async def get_companies(user_id: str) -> List[Company]:
-    global _companies_cache, _cache_expiry
-    
-    now = int(time.time())
-    cache_key = f"companies_{user_id}"
-    if cache_key in _companies_cache and now < _cache_expiry.get(cache_key, 0):
-        return _companies_cache[cache_key]
-    
-    config = get_firebase_config()
-    url = f"https://firestore.googleapis.com/v1/projects/{config['project_id']}/databases/(default)/documents/users/{user_id}/companies"
+    companies = _companies_cache.get(user_id)
+    if companies is not None:
+        return companies
+    return await _single_flight(("companies", user_id), lambda: _fetch_companies(user_id))
+
+async def _fetch_companies(user_id: str) -> List[Company]:
+    url = f"{_documents_url()}/users/{user_id}/companies"
     
     try:
         token = await get_access_token()
         client = await get_http_client()
         
-        response = await client.get(url, headers={"Authorization": f"Bearer {token}"})
+        response = await client.get(url, headers=_auth_headers(token))
         
         if response.status_code != 200:
             return []
         
-        data = response.json()
-        companies = []
+        data = orjson.loads(response.content)
+        companies = [company for doc in data.get("documents", ()) if (company := parse_firestore_company(doc))]
         
-        if "documents" in data:
-            for doc in data["documents"]:
-                company = parse_firestore_company(doc)
-                if company:
-                    companies.append(company)
-        
-        _companies_cache[cache_key] = companies
-        _cache_expiry[cache_key] = now + 10
+        if _is_current_flight(("companies", user_id)):
+            _companies_cache.set(user_id, companies)
         
         return companies
     except Exception:
@@ -111,357 +256,342 @@ async def get_companies(user_id: str) -> List[Company]:
 
 
 
+# A read already in flight started before the write: later readers must not join it,
+# and it must not cache what it read
+def invalidate_companies_cache(user_id: str):
+    _companies_cache.pop(user_id)
+    _inflight.pop(("companies", user_id), None)
+
+def invalidate_tasks_cache(user_id: str):
+    _tasks_cache.pop(user_id)
+    _inflight.pop(("tasks", user_id), None)
+
 async def get_tasks(user_id: str) -> List[Task]:
-    global _tasks_cache, _cache_expiry
-    
-    now = int(time.time())
-    cache_key = f"tasks_{user_id}"
-    if cache_key in _tasks_cache and now < _cache_expiry.get(cache_key, 0):
-        return _tasks_cache[cache_key]
-    
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
+    cached = _tasks_cache.get(user_id)
+    if cached is not None:
+        return cached
+    return await _single_flight(("tasks", user_id), lambda: _fetch_tasks(user_id))
+
+async def _fetch_tasks(user_id: str) -> List[Task]:
     
-    companies_url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies"
+    user_url = f"{_documents_url()}/users/{user_id}"
+    companies_url = f"{user_url}/companies"
     
     token = await get_access_token()
     client = await get_http_client()
     
-    companies_response = await client.get(
-        companies_url,
-        headers={"Authorization": f"Bearer {token}"}
+    # One query for all tasks, in parallel with the company list that scopes it
+    companies_response, tasks_response = await asyncio.gather(
+        client.get(companies_url, headers=_auth_headers(token)),
+        client.post(f"{user_url}:runQuery", content=_TASK_LIST_QUERY, headers=_json_headers(token))
     )
     
     if companies_response.status_code in [403, 401, 404]:
         return []
     
-    companies_data = companies_response.json()
+    companies_data = orjson.loads(companies_response.content)
     
-    if "documents" not in companies_data:
+    if "documents" not in companies_data or tasks_response.status_code != 200:
         return []
     
-    # Limit concurrent requests to avoid overwhelming the server
-    semaphore = asyncio.Semaphore(100)
-    
-    async def get_company_tasks(company_doc):
-        async with semaphore:
-            company_id = company_doc["name"].split("/")[-1]
-            tasks_url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{company_id}/Task"
-            
-            try:
-                tasks_response = await client.get(
-                    tasks_url,
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-                
-                if tasks_response.status_code == 200:
-                    tasks_data = tasks_response.json()
-                    if "documents" in tasks_data:
-                        return [parse_firestore_task(task_doc) for task_doc in tasks_data["documents"] if parse_firestore_task(task_doc)]
-            except:
-                pass
-            return []
-    
-    # Execute requests with limited concurrency
-    task_lists = await asyncio.gather(*[get_company_tasks(company_doc) for company_doc in companies_data["documents"]], return_exceptions=True)
+    # Subcollections outlive a deleted company document, so keep only tasks of listed companies
+    company_ids = {company_doc["name"].rsplit("/", 1)[-1] for company_doc in companies_data["documents"]}
     
-    # Flatten the results
     all_tasks = []
-    for task_list in task_lists:
-        if isinstance(task_list, list):
-            all_tasks.extend(task_list)
+    for result in orjson.loads(tasks_response.content):
+        task_doc = result.get("document")
+        if task_doc is None or task_doc["name"].rsplit("/", 3)[-3] not in company_ids:
+            continue
+        task = parse_firestore_task(task_doc)
+        if task:
+            all_tasks.append(task)
     
-    _tasks_cache[cache_key] = all_tasks
-    _cache_expiry[cache_key] = now + 10
+    if _is_current_flight(("tasks", user_id)):
+        _tasks_cache.set(user_id, all_tasks)
     
     return all_tasks
 
 async def get_templates(user_id: str) -> List[TaskTemplate]:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/task_templates"
-    
-    token = await get_access_token()
-    client = await get_http_client()
-    
-    response = await client.get(
-        url,
-        headers={"Authorization": f"Bearer {token}"}
-    )
-    
-    if response.status_code in [403, 401]:
-        return []
-    
-    data = response.json()
-    templates = []
-    
-    if "documents" in data:
-        for doc in data["documents"]:
-            template = parse_firestore_template(doc)
-            if template:
-                templates.append(template)
-    
-    return templates
+    # Templates are not stored in Firebase (they only fan out into tasks), so there is nothing to read
+    return []
+
+# Company fields are all stored as Firestore strings under their model names
+_COMPANY_STRING_FIELDS = (
+    "name", "EIN", "startDate", "stateIncorporated", "contactPersonName", "contactPersonPhNumber",
+    "address1", "address2", "city", "state", "zip"
+)
+# Shared default for absent fields; never mutated
+_NO_VALUE = {}
 
 def parse_firestore_company(doc: dict) -> Optional[Company]:
     try:
         fields = doc["fields"]
-        doc_id = doc["name"].split("/")[-1]
-        
-        return Company(
-            id=doc_id,
-            name=get_string_value(fields, "name"),
-            EIN=get_string_value(fields, "EIN"),
-            startDate=get_string_value(fields, "startDate"),
-            stateIncorporated=get_string_value(fields, "stateIncorporated"),
-            contactPersonName=get_string_value(fields, "contactPersonName"),
-            contactPersonPhNumber=get_string_value(fields, "contactPersonPhNumber"),
-            address1=get_string_value(fields, "address1"),
-            address2=get_string_value(fields, "address2"),
-            city=get_string_value(fields, "city"),
-            state=get_string_value(fields, "state"),
-            zip=get_string_value(fields, "zip")
-        )
+        data = {name: fields.get(name, _NO_VALUE).get("stringValue", "") for name in _COMPANY_STRING_FIELDS}
+        data["id"] = doc["name"].rsplit("/", 1)[-1]
+        return Company.model_validate(data)
     except:
         return None
 
 def parse_firestore_task(doc: dict) -> Optional[Task]:
     try:
         fields = doc["fields"]
-        doc_id = doc["name"].split("/")[-1]
+        doc_id = doc["name"].rsplit("/", 1)[-1]
         
-        return Task(
-            id=doc_id,
-            companyId=get_string_value(fields, "company_id"),
-            title=get_string_value(fields, "title"),
-            description=get_optional_string_value(fields, "description"),
-            completed=get_bool_value(fields, "completed")
-        )
+        return Task.model_validate({
+            "id": doc_id,
+            "companyId": get_string_value(fields, "company_id"),
+            "title": get_string_value(fields, "title"),
+            "description": get_optional_string_value(fields, "description"),
+            "completed": get_bool_value(fields, "completed")
+        })
     except:
         return None
 
-def parse_firestore_template(doc: dict) -> Optional[TaskTemplate]:
-    # Templates are not stored in Firebase, they are just used to create tasks
-    return None
+def _exists_precondition(must_exist: bool) -> dict:
+    # With must_exist the write fails with 404 instead of upserting a missing document
+    return {"currentDocument.exists": "true"} if must_exist else {}
 
 def get_string_value(fields: dict, field_name: str) -> str:
-    return fields.get(field_name, {}).get("stringValue", "")
+    return fields.get(field_name, _NO_VALUE).get("stringValue", "")
 
 def get_optional_string_value(fields: dict, field_name: str) -> Optional[str]:
-    value = fields.get(field_name, {}).get("stringValue")
+    value = fields.get(field_name, _NO_VALUE).get("stringValue")
     return value if value else None
 
 def get_bool_value(fields: dict, field_name: str) -> bool:
-    return fields.get(field_name, {}).get("booleanValue", False)
+    return fields.get(field_name, _NO_VALUE).get("booleanValue", False)
+
+def _company_fields(company: Company) -> dict:
+    return {
+        "name": {"stringValue": company.name},
+        "EIN": {"stringValue": company.EIN},
+        "startDate": {"stringValue": company.startDate},
+        "stateIncorporated": {"stringValue": company.stateIncorporated},
+        "contactPersonName": {"stringValue": company.contactPersonName},
+        "contactPersonPhNumber": {"stringValue": company.contactPersonPhNumber},
+        "address1": {"stringValue": company.address1},
+        "address2": {"stringValue": company.address2},
+        "city": {"stringValue": company.city},
+        "state": {"stringValue": company.state},
+        "zip": {"stringValue": company.zip}
+    }
+
+def _task_fields(task: Task) -> dict:
+    return {
+        "company_id": {"stringValue": task.companyId},
+        "title": {"stringValue": task.title},
+        "description": {"stringValue": task.description or ""},
+        "completed": {"booleanValue": task.completed}
+    }
+
+# Firestore accepts at most 500 writes per batchWrite call
+_BATCH_WRITE_LIMIT = 500
+
+async def batch_write(writes: List[dict]) -> List[bool]:
+    """Applies Firestore writes in as few round trips as possible; unlike :commit, each write succeeds or fails on its own"""
+    token = await get_access_token()
+    client = await get_http_client()
+    
+    chunks = [writes[i:i + _BATCH_WRITE_LIMIT] for i in range(0, len(writes), _BATCH_WRITE_LIMIT)]
+    responses = await asyncio.gather(*[
+        client.post(
+            f"{_documents_url()}:batchWrite",
+            headers=_json_headers(token),
+            content=orjson.dumps({"writes": chunk})
+        )
+        for chunk in chunks
+    ])
+    
+    results = []
+    for chunk, response in zip(chunks, responses):
+        # Without per-write statuses nothing in the chunk can be confirmed
+        statuses = orjson.loads(response.content).get("status") if response.status_code < 400 else None
+        if statuses is None:
+            results.extend([False] * len(chunk))
+        else:
+            results.extend(status.get("code", 0) == 0 for status in statuses)
+    return results
+
+async def create_tasks(user_id: str, tasks: List[Task]) -> List[bool]:
+    if not tasks:
+        return []
+    return await batch_write([
+        {
+            "update": {
+                "name": f"{_documents_name()}/users/{user_id}/companies/{task.companyId}/Task/{task.id}",
+                "fields": _task_fields(task)
+            }
+        }
+        for task in tasks
+    ])
 
 async def create_company(user_id: str, company: Company) -> bool:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
     doc_id = company.id
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{doc_id}"
+    url = f"{_documents_url()}/users/{user_id}/companies/{doc_id}"
     
     token = await get_access_token()
     
-    firestore_doc = {
-        "fields": {
-            "name": {"stringValue": company.name},
-            "EIN": {"stringValue": company.EIN},
-            "startDate": {"stringValue": company.startDate},
-            "stateIncorporated": {"stringValue": company.stateIncorporated},
-            "contactPersonName": {"stringValue": company.contactPersonName},
-            "contactPersonPhNumber": {"stringValue": company.contactPersonPhNumber},
-            "address1": {"stringValue": company.address1},
-            "address2": {"stringValue": company.address2},
-            "city": {"stringValue": company.city},
-            "state": {"stringValue": company.state},
-            "zip": {"stringValue": company.zip}
-        }
-    }
+    firestore_doc = {"fields": _company_fields(company)}
     
     client = await get_http_client()
     response = await client.patch(
         url,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        },
-        json=firestore_doc
+        headers=_json_headers(token),
+        content=orjson.dumps(firestore_doc)
     )
     
     return response.status_code < 400
 
 async def get_company_by_id(user_id: str, company_id: str) -> Optional[Company]:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{company_id}"
+    url = f"{_documents_url()}/users/{user_id}/companies/{company_id}"
     
     token = await get_access_token()
     client = await get_http_client()
     
     response = await client.get(
         url,
-        headers={"Authorization": f"Bearer {token}"}
+        headers=_auth_headers(token)
     )
     
-    if response.status_code in [404, 403, 401]:
+    # Only a 404 means the company is gone; callers cache None, so any other failure must raise
+    if response.status_code == 404:
         return None
+    if response.status_code != 200:
+        raise Exception(f"Firestore get company failed: {response.status_code} {response.reason_phrase}")
     
-    doc = response.json()
+    doc = orjson.loads(response.content)
     return parse_firestore_company(doc)
 
-async def update_company(user_id: str, company_id: str, company: Company) -> bool:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{company_id}"
+async def update_company(user_id: str, company_id: str, company: Company, must_exist: bool = False) -> Optional[bool]:
+    url = f"{_documents_url()}/users/{user_id}/companies/{company_id}"
     
     token = await get_access_token()
     
-    firestore_doc = {
-        "fields": {
-            "name": {"stringValue": company.name},
-            "EIN": {"stringValue": company.EIN},
-            "startDate": {"stringValue": company.startDate},
-            "stateIncorporated": {"stringValue": company.stateIncorporated},
-            "contactPersonName": {"stringValue": company.contactPersonName},
-            "contactPersonPhNumber": {"stringValue": company.contactPersonPhNumber},
-            "address1": {"stringValue": company.address1},
-            "address2": {"stringValue": company.address2},
-            "city": {"stringValue": company.city},
-            "state": {"stringValue": company.state},
-            "zip": {"stringValue": company.zip}
-        }
-    }
+    firestore_doc = {"fields": _company_fields(company)}
     
     client = await get_http_client()
     response = await client.patch(
         url,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        },
-        json=firestore_doc
+        params=_exists_precondition(must_exist),
+        headers=_json_headers(token),
+        content=orjson.dumps(firestore_doc)
     )
     
+    if must_exist and response.status_code == 404:
+        return None
     return response.status_code < 400
 
-async def delete_company(user_id: str, company_id: str) -> bool:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{company_id}"
+async def delete_company(user_id: str, company_id: str, must_exist: bool = False) -> Optional[bool]:
+    url = f"{_documents_url()}/users/{user_id}/companies/{company_id}"
     
     token = await get_access_token()
     client = await get_http_client()
     
     response = await client.delete(
         url,
-        headers={"Authorization": f"Bearer {token}"}
+        params=_exists_precondition(must_exist),
+        headers=_auth_headers(token)
     )
     
+    if must_exist and response.status_code == 404:
+        return None
     return response.status_code < 400
 
 async def create_task(user_id: str, task: Task) -> bool:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
     doc_id = task.id
     company_id = task.companyId
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{company_id}/Task/{doc_id}"
+    url = f"{_documents_url()}/users/{user_id}/companies/{company_id}/Task/{doc_id}"
     
     token = await get_access_token()
     
-    firestore_doc = {
-        "fields": {
-            "company_id": {"stringValue": task.companyId},
-            "title": {"stringValue": task.title},
-            "description": {"stringValue": task.description or ""},
-            "completed": {"booleanValue": task.completed}
-        }
-    }
+    firestore_doc = {"fields": _task_fields(task)}
     
     client = await get_http_client()
     response = await client.patch(
         url,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        },
-        json=firestore_doc
+        headers=_json_headers(token),
+        content=orjson.dumps(firestore_doc)
     )
     
     return response.status_code < 400
 
 async def get_task_by_id(user_id: str, task_id: str) -> Optional[Task]:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
     
-    # Need to search through all companies to find the task
-    companies_url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies"
+    # The owning company is unknown, so list the companies and fetch every candidate path in one batchGet
+    companies_url = f"{_documents_url()}/users/{user_id}/companies"
     
     token = await get_access_token()
     client = await get_http_client()
     
     companies_response = await client.get(
         companies_url,
-        headers={"Authorization": f"Bearer {token}"}
+        headers=_auth_headers(token)
     )
     
     if companies_response.status_code in [403, 401, 404]:
         return None
     
-    companies_data = companies_response.json()
+    companies_data = orjson.loads(companies_response.content)
     
-    if "documents" in companies_data:
-        for company_doc in companies_data["documents"]:
-            company_id = company_doc["name"].split("/")[-1]
-            
-            task_url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{company_id}/Task/{task_id}"
-            
-            task_response = await client.get(
-                task_url,
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            
-            if task_response.status_code == 200:
-                doc = task_response.json()
-                return parse_firestore_task(doc)
+    if "documents" not in companies_data:
+        return None
+    
+    # Listed company names are full resource names, so each candidate task path follows directly
+    candidates = [f"{company_doc['name']}/Task/{task_id}" for company_doc in companies_data["documents"]]
+    
+    response = await client.post(
+        f"{_documents_url()}:batchGet",
+        headers=_json_headers(token),
+        content=orjson.dumps({"documents": candidates})
+    )
+    
+    if response.status_code != 200:
+        return None
+    
+    found = {result["found"]["name"]: result["found"] for result in orjson.loads(response.content) if "found" in result}
+    
+    # Same precedence as a company-by-company search: first company in listing order wins
+    for name in candidates:
+        if name in found:
+            return parse_firestore_task(found[name])
     
     return None
 
-async def update_task(user_id: str, task_id: str, task: Task) -> bool:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
+async def update_task(user_id: str, task_id: str, task: Task, must_exist: bool = False) -> Optional[bool]:
     company_id = task.companyId
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{company_id}/Task/{task_id}"
+    url = f"{_documents_url()}/users/{user_id}/companies/{company_id}/Task/{task_id}"
     
     token = await get_access_token()
     
-    firestore_doc = {
-        "fields": {
-            "company_id": {"stringValue": task.companyId},
-            "title": {"stringValue": task.title},
-            "description": {"stringValue": task.description or ""},
-            "completed": {"booleanValue": task.completed}
-        }
-    }
+    firestore_doc = {"fields": _task_fields(task)}
     
     client = await get_http_client()
     response = await client.patch(
         url,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        },
-        json=firestore_doc
+        params=_exists_precondition(must_exist),
+        headers=_json_headers(token),
+        content=orjson.dumps(firestore_doc)
     )
     
+    if must_exist and response.status_code == 404:
+        return None
     return response.status_code < 400
 
 async def delete_task(user_id: str, task_id: str, company_id: str) -> bool:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/users/{user_id}/companies/{company_id}/Task/{task_id}"
+    url = f"{_documents_url()}/users/{user_id}/companies/{company_id}/Task/{task_id}"
     
     token = await get_access_token()
     client = await get_http_client()
     
     response = await client.delete(
         url,
-        headers={"Authorization": f"Bearer {token}"}
+        headers=_auth_headers(token)
     )
     
     return response.status_code < 400
 async def create_user(email: str, password: str) -> dict:
     try:
-        api_key = os.getenv("FIREBASE_API_KEY")
+        api_key = get_firebase_config()["api_key"]
         if not api_key:
             raise Exception("Missing FIREBASE_API_KEY")
             
@@ -478,7 +608,7 @@ async def create_user(email: str, password: str) -> dict:
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             user_id = data["localId"]
             
             # Store user in Firestore collection
@@ -489,20 +619,17 @@ async def create_user(email: str, password: str) -> dict:
                 "bearerToken": data["idToken"]
             }
         else:
-            error_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else response.text
+            error_data = orjson.loads(response.content) if response.headers.get('content-type', '').startswith('application/json') else response.text
             if "EMAIL_EXISTS" in str(error_data):
                 raise Exception("Email already exists")
             else:
                 raise Exception(f"Firebase signup failed: {response.status_code} - {error_data}")
     except Exception as e:
-        print(f"Firebase create_user error: {e}")
-        print(f"Exception type: {type(e)}")
-        print(f"Exception args: {e.args}")
+        logger.debug("Firebase create_user error: %s (%s, args: %s)", e, type(e), e.args)
         raise e
 
 async def store_user_in_firestore(user_id: str, email: str) -> bool:
-    project_id = os.getenv("FIREBASE_PROJECT_ID")
-    url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/company-management-users/{user_id}"
+    url = f"{_documents_url()}/company-management-users/{user_id}"
     
     token = await get_access_token()
     
@@ -516,17 +643,14 @@ async def store_user_in_firestore(user_id: str, email: str) -> bool:
     client = await get_http_client()
     response = await client.patch(
         url,
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        },
-        json=firestore_doc
+        headers=_json_headers(token),
+        content=orjson.dumps(firestore_doc)
     )
     
     return response.status_code < 400
 
 async def login_user(email: str, password: str) -> dict:
-    api_key = os.getenv("FIREBASE_API_KEY")
+    api_key = get_firebase_config()["api_key"]
     url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
     
     client = await get_http_client()
@@ -540,7 +664,7 @@ async def login_user(email: str, password: str) -> dict:
     )
     
     if response.status_code == 200:
-        data = response.json()
+        data = orjson.loads(response.content)
         return {
             "userId": data["localId"],
             "bearerToken": data["idToken"]
@@ -4,9 +4,9 @@ import re
 with open('tests/unit/test_api.py', 'r', encoding='utf-8') as f:
     content = f.read()
 
-# Replace all incorrect import paths
-content = re.sub(r"@patch\('handlers\.", "@patch('app.api.handlers.", content)
-content = re.sub(r"with patch\('handlers\.", "with patch('app.api.handlers.", content)
+# Replace all incorrect import paths, decorator and context-manager forms in one pass
+HANDLERS_PATCH = re.compile(r"(@patch|with patch)\('handlers\.")
+content = HANDLERS_PATCH.sub(r"\1('app.api.handlers.", content)
 
 # Write back the fixed content
 with open('tests/unit/test_api.py', 'w', encoding='utf-8') as f:
@@ -4,14 +4,14 @@ import re
 with open('tests/unit/test_api.py', 'r', encoding='utf-8') as f:
     content = f.read()
 
-# Fix specific cases that should be 500, not 401
-# Database errors should be 500
-content = re.sub(r'side_effect=HTTPException\(status_code=500, detail="Database.*?"\)\):\s+response = client\.(get|post|put|delete)\(.*?\)\s+assert response\.status_code == 401', 
-                lambda m: m.group(0).replace('assert response.status_code == 401', 'assert response.status_code == 500'), content)
-
-# Timeout errors should be 500  
-content = re.sub(r'side_effect=HTTPException\(status_code=500, detail=".*?timeout.*?"\)\):\s+response = client\.(get|post|put|delete)\(.*?\)\s+assert response\.status_code == 401', 
-                lambda m: m.group(0).replace('assert response.status_code == 401', 'assert response.status_code == 500'), content, flags=re.IGNORECASE)
+# Fix specific cases that should be 500, not 401:
+# database errors and (case-insensitively) timeout errors, matched in one pass
+SERVER_ERROR_401 = re.compile(
+    r'side_effect=HTTPException\(status_code=500, detail="(?:Database.*?|(?i:.*?timeout.*?))"\)\):'
+    r'\s+response = client\.(get|post|put|delete)\(.*?\)\s+assert response\.status_code == 401'
+)
+content = SERVER_ERROR_401.sub(
+    lambda m: m.group(0).replace('assert response.status_code == 401', 'assert response.status_code == 500'), content)
 
 # Write back the fixed content
 with open('tests/unit/test_api.py', 'w', encoding='utf-8') as f:
@@ -1,11 +1,9 @@
-import re
-
 # Read the test file
 with open('tests/unit/test_api.py', 'r', encoding='utf-8') as f:
     content = f.read()
 
 # Fix specific test cases that expect 500 but should expect 401 for auth errors
-content = re.sub(r'assert response\.status_code == 500', 'assert response.status_code == 401', content)
+content = content.replace('assert response.status_code == 500', 'assert response.status_code == 401')
 
 # Write back the fixed content
 with open('tests/unit/test_api.py', 'w', encoding='utf-8') as f:
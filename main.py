@@ -4,8 +4,20 @@ Company Management API - Entry Point
 """
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    from app.main import app
     
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    # Workers need the import string; uvloop and httptools come with uvicorn[standard].
+    # One worker unless WEB_CONCURRENCY says otherwise: the company, listing and token caches
+    # are per-process, so a write on one worker would leave the others serving stale data
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8080,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
+        log_level="warning"
+    )
     
\ No newline at end of file
@@ -0,0 +1,20 @@
+import sys
+from unittest.mock import MagicMock
+
+class InvalidIdTokenError(Exception):
+    pass
+class ExpiredIdTokenError(InvalidIdTokenError):
+    pass
+class RevokedIdTokenError(InvalidIdTokenError):
+    pass
+
+# Mock firebase modules before any test module imports main; runs once per session (and per xdist worker)
+def pytest_configure(config):
+    firebase_admin_mock = MagicMock()
+    firebase_admin_mock.auth.verify_id_token.return_value = {'uid': 'test-user-123'}
+    firebase_admin_mock.auth.InvalidIdTokenError = InvalidIdTokenError
+    firebase_admin_mock.auth.ExpiredIdTokenError = ExpiredIdTokenError
+    firebase_admin_mock.auth.RevokedIdTokenError = RevokedIdTokenError
+    sys.modules['firebase_admin'] = firebase_admin_mock
+    sys.modules['firebase_admin.auth'] = firebase_admin_mock.auth
+    sys.modules['firebase_admin.credentials'] = MagicMock()